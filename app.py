@@ -12,6 +12,7 @@ import time
 import random
 import pandas as pd
 import io
+from dedup import DedupIndex
 
 # Configurazione della pagina
 st.set_page_config(
@@ -147,9 +148,15 @@ def get_selenium_driver(user_agent=None, disable_headless=False, proxy=None):
         return None
 
 
+# Indice di deduplicazione condiviso tra ricerche ed esecuzioni
+@st.cache_resource
+def get_dedup_index():
+    """Restituisce l'indice degli annunci già visti (esatto su ID/URL e MinHash/LSH su titolo, prezzo e luogo)."""
+    return DedupIndex()
+
 
 # Funzione per il web scraping di Subito.it
-def scrape_subito(url, human_like=True, disable_headless=False, search_term=None):
+def scrape_subito(url, human_like=True, disable_headless=False, search_term=None, skip_seen=False):
     """
     Funzione per il web scraping di Subito.it con Selenium.
     
@@ -158,6 +165,7 @@ def scrape_subito(url, human_like=True, disable_headless=False, search_term=None
         human_like: Se True, simula comportamenti umani durante la navigazione
         disable_headless: Se True, mostra il browser durante lo scraping
         search_term: Termine di ricerca da cercare su Subito.it
+        skip_seen: Se True, esclude gli annunci già visti in ricerche precedenti della sessione
     """
     # Scegli casualmente uno user agent da una lista di user agent comuni
     user_agents = [
@@ -325,11 +333,17 @@ def scrape_subito(url, human_like=True, disable_headless=False, search_term=None
                 ]
                 
                 search_results = []
+                dedup_index = get_dedup_index()
+                run_keys = set()  # Cluster già inclusi in questa ricerca
+                seen_clusters = st.session_state.setdefault("seen_clusters", set())  # Cluster già mostrati in questa sessione
+                duplicates = 0
                 for selector in result_selectors:
                     try:
                         items = driver.find_elements(By.CSS_SELECTOR, selector)
                         if items:
-                            for item in items[:10]:  # Limita a 10 risultati
+                            for item in items:
+                                if len(search_results) >= 10:  # Limita a 10 risultati unici
+                                    break
                                 try:
                                     # Estrai titolo, prezzo e link
                                     title_elem = item.find_element(By.CSS_SELECTOR, "h2, h3, [class*='title']")
@@ -345,11 +359,27 @@ def scrape_subito(url, human_like=True, disable_headless=False, search_term=None
                                     except:
                                         link = "Link non disponibile"
                                     
-                                    search_results.append({
+                                    location_text = ""
+                                    try:
+                                        location_elem = item.find_element(By.CSS_SELECTOR, "[class*='town'], [class*='city'], [class*='location']")
+                                        location_text = location_elem.text.strip()
+                                    except:
+                                        pass  # Il luogo è facoltativo
+                                    
+                                    listing = {
                                         "titolo": title_text,
                                         "prezzo": price_text,
-                                        "link": link
-                                    })
+                                        "link": link,
+                                        "luogo": location_text
+                                    }
+                                    
+                                    # Scarta duplicati esatti e quasi duplicati (ripost)
+                                    cluster, _ = dedup_index.add(listing)
+                                    if cluster in run_keys or (skip_seen and cluster in seen_clusters):
+                                        duplicates += 1
+                                        continue
+                                    run_keys.add(cluster)
+                                    search_results.append(listing)
                                 except:
                                     continue
                             break  # Se abbiamo trovato risultati, esci dal ciclo
@@ -360,6 +390,10 @@ def scrape_subito(url, human_like=True, disable_headless=False, search_term=None
                     extracted_texts.append(f"Risultati di ricerca per '{search_term}':")
                     for i, result in enumerate(search_results, 1):
                         extracted_texts.append(f"{i}. {result['titolo']} - {result['prezzo']}")
+                seen_clusters.update(run_keys)
+                
+                if duplicates:
+                    extracted_texts.append(f"Annunci duplicati esclusi: {duplicates}")
             except Exception as e:
                 print(f"Errore durante l'estrazione dei risultati di ricerca: {e}")
         
@@ -372,6 +406,8 @@ def scrape_subito(url, human_like=True, disable_headless=False, search_term=None
         # Aggiungi i risultati di ricerca di Subito.it se disponibili
         if search_term and 'search_results' in locals() and search_results:
             result["search_results"] = search_results
+        if search_term and 'duplicates' in locals():
+            result["duplicates"] = duplicates
         
         return result
     except Exception as e:
@@ -396,7 +432,7 @@ with st.container():
                               placeholder="es. iPhone, bicicletta, divano...")
     
     # Opzioni in una riga compatta
-    col_opt1, col_opt2, col_opt3 = st.columns([2, 2, 1])
+    col_opt1, col_opt2, col_opt3, col_opt4 = st.columns([2, 2, 2, 1])
     with col_opt1:
         human_like = st.checkbox("Comportamento umano", value=True, 
                                help="Simula comportamenti umani")
@@ -404,6 +440,9 @@ with st.container():
         disable_headless = st.checkbox("Mostra browser", value=False, 
                                      help="Utile per debug")
     with col_opt3:
+        skip_seen = st.checkbox("Escludi già visti", value=False, 
+                              help="Nasconde gli annunci (e i ripost) già trovati in ricerche precedenti di questa sessione")
+    with col_opt4:
         st.button("Esegui", type="primary")
 
 
@@ -420,7 +459,8 @@ if st.button("Esegui", type="primary", key="main_button"):
                 url_input, 
                 human_like=human_like, 
                 disable_headless=disable_headless,
-                search_term=search_term
+                search_term=search_term,
+                skip_seen=skip_seen
             )
             
             if isinstance(result, dict):
@@ -433,6 +473,9 @@ if st.button("Esegui", type="primary", key="main_button"):
                     
                     st.markdown(f"**Titolo:** {result['title']}")
                     
+                    if result.get("duplicates"):
+                        st.caption(f"♻️ {result['duplicates']} annunci duplicati o già visti esclusi")
+                    
                     # Mostra i risultati di ricerca di Subito.it se disponibili
                     if "search_results" in result and result["search_results"]:
                         st.markdown("### 🔍 Risultati di ricerca su Subito.it")
@@ -464,6 +507,10 @@ if st.button("Esegui", type="primary", key="main_button"):
                                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                             )
                     
+                    elif result.get("duplicates"):
+                        st.info("Tutti i risultati trovati sono duplicati o annunci già visti in questa sessione. "
+                                "Disattiva \"Escludi già visti\" per mostrarli di nuovo.")
+                    
                     elif result["elements"]:
                         st.markdown("**Elementi H1:**")
                         for i, text in enumerate(result["elements"], 1):
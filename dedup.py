@@ -0,0 +1,217 @@
+"""
+Indice di deduplicazione per gli annunci di Subito.it.
+
+Combina un indice esatto sull'ID/URL dell'annuncio con un indice MinHash/LSH
+sul titolo, per riconoscere i ripost quasi identici pubblicati con un nuovo
+URL. I candidati trovati tramite LSH sono confermati solo se anche prezzo e
+luogo coincidono. L'indice è incrementale e limitato in memoria: superato il
+numero massimo di annunci, i più vecchi vengono rimossi in ordine di
+inserimento (FIFO). Ogni annuncio occupa circa 1,5 KB, quindi il limite
+predefinito di 50.000 annunci corrisponde a circa 75 MB.
+"""
+
+import re
+import threading
+import random
+from array import array
+from collections import OrderedDict
+from hashlib import blake2b
+
+_MASK_32 = (1 << 32) - 1
+
+# Gli URL degli annunci terminano con "-<id>.htm"
+_LISTING_ID_RE = re.compile(r"-(\d+)\.htm")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+# Prezzo in formato italiano, es. "1.200 €" o "49,90 €"
+_PRICE_RE = re.compile(r"\d[\d.\s]*(?:,\d+)?")
+
+
+def listing_key(link):
+    """
+    Restituisce la chiave esatta di un annuncio: l'ID se presente nell'URL,
+    altrimenti l'URL normalizzato (senza query string e frammento).
+    """
+    if not link or link == "Link non disponibile":
+        return None
+    match = _LISTING_ID_RE.search(link)
+    if match:
+        return f"id:{match.group(1)}"
+    return "url:" + link.split("#", 1)[0].split("?", 1)[0].rstrip("/").lower()
+
+
+def normalize_price(price):
+    """Converte il prezzo in euro interi (es. "1.200 €" -> 1200), None se assente."""
+    match = _PRICE_RE.search(price or "")
+    if not match:
+        return None
+    digits = re.sub(r"\D", "", match.group(0).split(",", 1)[0])
+    return int(digits) if digits else None
+
+
+def normalize_location(location):
+    """Normalizza il luogo in minuscolo e senza punteggiatura, None se assente."""
+    words = _WORD_RE.findall((location or "").lower())
+    return " ".join(words) or None
+
+
+def _title_shingles(title):
+    """Restituisce i trigrammi di caratteri del titolo normalizzato."""
+    text = " ".join(_WORD_RE.findall((title or "").lower()))
+    if not text:
+        return set()
+    return {text[i:i + 3] for i in range(max(1, len(text) - 2))}
+
+
+class DedupIndex:
+    """
+    Indice incrementale per annunci duplicati e quasi duplicati.
+
+    Args:
+        num_perm: Numero di funzioni hash della firma MinHash
+        bands: Numero di bande LSH (num_perm deve essere divisibile per bands)
+        threshold: Similarità Jaccard stimata minima tra i titoli
+        price_tolerance: Differenza relativa massima tra i prezzi (es. 0.05 = 5%)
+        max_items: Numero massimo di annunci mantenuti in memoria
+        seed: Seme per generare le funzioni hash (deve restare fisso tra le esecuzioni)
+    """
+
+    def __init__(self, num_perm=64, bands=8, threshold=0.8, price_tolerance=0.05,
+                 max_items=50_000, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm deve essere divisibile per bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.price_tolerance = price_tolerance
+        self.max_items = max_items
+
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(64) for _ in range(num_perm)]
+
+        # chiave annuncio -> (chiave canonica del cluster, firma del titolo, prezzo, luogo)
+        self._entries = OrderedDict()
+        # chiave della banda -> chiave annuncio, oppure insieme di chiavi in caso di collisione
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _signature(self, tokens):
+        """Calcola la firma MinHash di un insieme di shingle."""
+        hashes = [
+            int.from_bytes(blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            for token in tokens
+        ]
+        return array("I", [min(h ^ mask for h in hashes) & _MASK_32 for mask in self._masks])
+
+    def _band_keys(self, signature):
+        """Suddivide la firma in bande e restituisce una chiave hash per ciascuna."""
+        return [
+            hash((band, tuple(signature[band * self.rows:(band + 1) * self.rows])))
+            for band in range(self.bands)
+        ]
+
+    def _similarity(self, first, second):
+        """Stima la similarità Jaccard confrontando due firme MinHash."""
+        return sum(1 for x, y in zip(first, second) if x == y) / self.num_perm
+
+    def _same_listing(self, price, location, other_price, other_location):
+        """
+        Conferma un candidato LSH: il prezzo deve essere presente su entrambi e
+        rientrare nella tolleranza, il luogo deve coincidere (o mancare su entrambi).
+        """
+        if price is None or other_price is None:
+            return False
+        if abs(price - other_price) > self.price_tolerance * max(price, other_price):
+            return False
+        return location == other_location
+
+    def _bucket_add(self, band_key, key):
+        bucket = self._buckets.get(band_key)
+        if bucket is None:
+            self._buckets[band_key] = key
+        elif isinstance(bucket, set):
+            bucket.add(key)
+        else:
+            self._buckets[band_key] = {bucket, key}
+
+    def _bucket_remove(self, band_key, key):
+        bucket = self._buckets.get(band_key)
+        if isinstance(bucket, set):
+            bucket.discard(key)
+            if len(bucket) == 1:
+                self._buckets[band_key] = next(iter(bucket))
+        elif bucket == key:
+            del self._buckets[band_key]
+
+    def _candidates(self, band_keys):
+        """Restituisce le chiavi degli annunci che condividono almeno una banda."""
+        candidates = set()
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if isinstance(bucket, set):
+                candidates.update(bucket)
+            elif bucket is not None:
+                candidates.add(bucket)
+        return candidates
+
+    def _evict(self):
+        """Rimuove gli annunci più vecchi finché l'indice rientra nel limite."""
+        while len(self._entries) > self.max_items:
+            key, (_, signature, _, _) = self._entries.popitem(last=False)
+            if signature is not None:
+                for band_key in self._band_keys(signature):
+                    self._bucket_remove(band_key, key)
+
+    def add(self, listing):
+        """
+        Inserisce un annuncio nell'indice.
+
+        Args:
+            listing: Dizionario con le chiavi "titolo", "prezzo", "link" e, opzionalmente, "luogo"
+
+        Returns:
+            Tupla (chiave canonica del cluster, True se l'annuncio era già noto)
+        """
+        price = normalize_price(listing.get("prezzo"))
+        location = normalize_location(listing.get("luogo"))
+        tokens = _title_shingles(listing.get("titolo"))
+        key = listing_key(listing.get("link"))
+        if key is None:
+            # Senza link usa il contenuto stesso come chiave esatta
+            key = f"content:{'|'.join(sorted(tokens))}|{price}|{location}"
+
+        with self._lock:
+            # Indice esatto: stesso ID/URL già visto
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0], True
+
+            # Senza titolo non c'è nulla da confrontare: solo indice esatto
+            if not tokens:
+                self._entries[key] = (key, None, price, location)
+                self._evict()
+                return key, False
+
+            signature = self._signature(tokens)
+            band_keys = self._band_keys(signature)
+
+            # Indice LSH sul titolo: i candidati sono confermati con prezzo e luogo
+            canonical = None
+            best = self.threshold
+            for candidate in self._candidates(band_keys):
+                candidate_canonical, candidate_signature, candidate_price, candidate_location = self._entries[candidate]
+                if not self._same_listing(price, location, candidate_price, candidate_location):
+                    continue
+                similarity = self._similarity(signature, candidate_signature)
+                if similarity >= best:
+                    canonical, best = candidate_canonical, similarity
+
+            self._entries[key] = (canonical or key, signature, price, location)
+            for band_key in band_keys:
+                self._bucket_add(band_key, key)
+            self._evict()
+
+            return canonical or key, canonical is not None
@@ -0,0 +1,70 @@
+from dedup import DedupIndex, listing_key, normalize_price
+
+
+def _listing(listing_id, titolo, prezzo="650 €", luogo="Milano"):
+    return {
+        "titolo": titolo,
+        "prezzo": prezzo,
+        "link": f"https://www.subito.it/telefonia/annuncio-milano-{listing_id}.htm",
+        "luogo": luogo,
+    }
+
+
+def test_listing_key_same_id_from_different_urls():
+    assert listing_key("https://www.subito.it/telefonia/iphone-milano-123.htm") == "id:123"
+    assert listing_key("https://www.subito.it/telefonia/iphone-milano-123.htm?utm=x#foto") == "id:123"
+    assert listing_key("https://subito.it/altro/slug-diverso-123.htm") == "id:123"
+    assert listing_key("https://www.subito.it/pagina/?q=1") == "url:https://www.subito.it/pagina"
+    assert listing_key("Link non disponibile") is None
+
+
+def test_normalize_price():
+    assert normalize_price("1.200 €") == 1200
+    assert normalize_price("49,90 €") == 49
+    assert normalize_price("Prezzo non disponibile") is None
+
+
+def test_exact_duplicate_by_id():
+    index = DedupIndex()
+    assert index.add(_listing(1, "iPhone 13 Pro 128GB blu")) == ("id:1", False)
+    duplicate = dict(_listing(1, "iPhone 13 Pro 128GB blu"), link="https://subito.it/x-1.htm?ref=2")
+    assert index.add(duplicate) == ("id:1", True)
+    assert len(index) == 1
+
+
+def test_repost_with_new_id_is_clustered():
+    index = DedupIndex()
+    index.add(_listing(1, "iPhone 13 Pro 128GB blu come nuovo"))
+    assert index.add(_listing(2, "iPhone 13 Pro 128GB blu come nuovo!")) == ("id:1", True)
+
+
+def test_same_title_different_price_or_city_not_merged():
+    index = DedupIndex()
+    title = "Samsung Galaxy S21 Ultra 256GB nero"
+    index.add(_listing(1, title, "400 €", "Torino"))
+    assert index.add(_listing(2, title, "900 €", "Torino")) == ("id:2", False)
+    assert index.add(_listing(3, title, "400 €", "Napoli")) == ("id:3", False)
+    # Un prezzo mancante non conta come corrispondenza
+    assert index.add(_listing(4, title, "Prezzo non disponibile", "Torino")) == ("id:4", False)
+    # Una piccola differenza di prezzo rientra nella tolleranza
+    assert index.add(_listing(5, title, "410 €", "Torino")) == ("id:1", True)
+
+
+def test_eviction_is_fifo_and_keeps_buckets_consistent():
+    index = DedupIndex(max_items=3)
+    listings = [_listing(i, f"Bicicletta da corsa modello {i} carbonio", f"{100 + i * 50} €") for i in range(10)]
+    for listing in listings[:3]:
+        index.add(listing)
+    # Un annuncio ripetuto non rinnova la sua posizione nella coda
+    index.add(listings[0])
+    index.add(listings[3])
+    assert list(index._entries) == ["id:1", "id:2", "id:3"]
+
+    for listing in listings[4:]:
+        index.add(listing)
+    assert list(index._entries) == ["id:7", "id:8", "id:9"]
+    keys = set()
+    for bucket in index._buckets.values():
+        keys.update(bucket if isinstance(bucket, set) else {bucket})
+    assert keys == set(index._entries)
+    assert all(len(bucket) > 1 for bucket in index._buckets.values() if isinstance(bucket, set))